@@ -1,212 +1,254 @@
+import multiprocessing
 import os
 import sys
 
-from PIL import Image, ImageDraw, ImageColor
+import numpy as np
 import pandas as pd
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, the kernels below also run as plain python
+    def njit(*args, **kwargs):
+        return lambda f: f
+
 LOG_STEPS = {}
+# per-step timestamps of the calibration and the last blockExit event
+START_TIMESTAMPS = np.zeros(0, dtype=np.int64)
+FINAL_TIMESTAMPS = np.zeros(0, dtype=np.int64)
 NUM_HIGHLIGHT_NODES = 10
 HIDE_SEEK = True
 
+# what each DeviceEvent describes, indexed by the event id
+CALIBRATION, NODE, BLOCK, EXIT = range(4)
+EVENT_KINDS = np.array([CALIBRATION, NODE, NODE, BLOCK, BLOCK, EXIT],
+                       dtype=np.uint8)
+
+# layout of DeviceTracing::DeviceLog, 32 bytes per event
+EVENT_DTYPE = np.dtype([("event", "<u4"), ("funcID", "<u4"),
+                        ("numInvocations", "<u4"), ("nodeID", "<u4"),
+                        ("blockID", "<u4"), ("smID", "<u4"),
+                        ("cycleCount", "<u8")])
+FINAL_CYCLE_DTYPE = np.dtype([("blockID", "<u4"), ("cycleCount", "<i8")])
+
+
+def pair_block_events(blocks):
+    # every execution of a block is a blockStart followed by blockWaits
+    # on the same (smID, numInvocations, nodeID, blockID)
+    columns = {k: blocks[k].to_numpy() for k in blocks.columns}
+    keys = [
+        columns[k] for k in ["blockID", "nodeID", "numInvocations", "smID"]
+    ]
+    order = np.lexsort(keys)
+    heads = np.ones(len(order), dtype=bool)
+    heads[1:] = np.any([k[order[1:]] != k[order[:-1]] for k in keys], axis=0)
+    heads = np.nonzero(heads)[0]
+
+    # the first event of every execution in log order is its blockStart
+    starts = order[heads]
+    assert (columns["event"][starts] == 3).all()
+    assert len(heads) == np.count_nonzero(columns["event"] == 3)
+    ends = np.maximum.reduceat(columns["cycleCount"][order], heads)
+
+    # keep the executions in the order they started
+    by_start = np.argsort(starts)
+    starts = starts[by_start]
+    return {
+        "smID": columns["smID"][starts],
+        "nodeID": columns["nodeID"][starts],
+        "blockID": columns["blockID"][starts],
+        "start": columns["cycleCount"][starts],
+        "end": ends[by_start]
+    }
 
-def parse_device_logs(events):
-    global LOG_STEPS
-    STEP = -1
 
-    def new_step():
-        nonlocal STEP
-        STEP += 1
-        LOG_STEPS[STEP] = {
-            "events": {},
-            "SMs": {},
-            "mapping": {},
-            "final_cycles": {},
-            "start_timestamp": 0xFFFFFFFFFFFFFFFF,
-            "final_timestamp": 0
+def validate(trace):
+    # checked once over the whole trace instead of per event while parsing
+    kind = trace["kind"]
+    nodes = trace[kind == NODE]
+    assert not nodes.duplicated(["step_id", "nodeID", "event"]).any()
+    # a node runs a single function with a fixed number of invocations
+    assert (nodes.groupby(["step_id", "nodeID"])[[
+        "funcID", "numInvocations"
+    ]].nunique().to_numpy() == 1).all()
+
+    exits = trace[kind == EXIT]
+    assert not exits.duplicated(["step_id", "blockID"]).any()
+
+    # blocks only start after the calibration of their megakernel
+    start_timestamps = trace["cycleCount"][kind == CALIBRATION].to_numpy()
+    blocks = trace[kind == BLOCK]
+    assert (blocks["cycleCount"].to_numpy() >
+            start_timestamps[blocks["step_id"].to_numpy()]).all()
+
+
+def parse_device_logs(records):
+    global LOG_STEPS, START_TIMESTAMPS, FINAL_TIMESTAMPS
+    trace = pd.DataFrame(records)
+    trace["cycleCount"] = trace["cycleCount"].astype(np.int64)
+    assert (records["event"] < len(EVENT_KINDS)).all(), "unsupported event"
+    # classify every event once, later dispatch is a single comparison
+    trace["kind"] = EVENT_KINDS[records["event"]]
+    # each megakernel begins with a calibration event
+    trace["step_id"] = np.cumsum(trace["kind"] == CALIBRATION) - 1
+    trace = trace[trace["step_id"] >= 0]
+    validate(trace)
+
+    kind = trace["kind"]
+    START_TIMESTAMPS = trace["cycleCount"][kind == CALIBRATION].to_numpy()
+    final_timestamps = trace[kind == EXIT].groupby(
+        "step_id")["cycleCount"].max()
+    FINAL_TIMESTAMPS = np.zeros(len(START_TIMESTAMPS), dtype=np.int64)
+    FINAL_TIMESTAMPS[final_timestamps.index] = final_timestamps.to_numpy()
+
+    for STEP, step in trace.groupby("step_id"):
+        kind = step["kind"]
+        nodes = step[kind == NODE]
+
+        # funcID and numInvocations indexed by nodeID, -1 for skipped nodes
+        node_ids = nodes["nodeID"].to_numpy()
+        num_nodes = node_ids.max(initial=0) + 1
+        mapping = {
+            "funcID": np.full(num_nodes, -1, dtype=np.int64),
+            "invocations": np.full(num_nodes, -1, dtype=np.int64)
         }
+        mapping["funcID"][node_ids] = nodes["funcID"].to_numpy()
+        mapping["invocations"][node_ids] = nodes["numInvocations"].to_numpy()
 
-    for i in range(0, len(events), 32):
-        array = events[i:i + 32]
-
-        event = int.from_bytes(array[:4], byteorder='little')
-        funcID = int.from_bytes(array[4:8], byteorder='little')
-        numInvocations = int.from_bytes(array[8:12], byteorder='little')
-        nodeID = int.from_bytes(array[12:16], byteorder='little')
-        blockID = int.from_bytes(array[16:20], byteorder='little')
-        smID = int.from_bytes(array[20:24], byteorder='little')
-        cycleCount = int.from_bytes(array[24:32], byteorder='little')
-
-        if event == 0:
-            # beginning of a megakernel
-            new_step()
-            LOG_STEPS[STEP]["start_timestamp"] = cycleCount
-
-        elif event in [1, 2]:
-            if nodeID not in LOG_STEPS[STEP]["mapping"]:
-                LOG_STEPS[STEP]["mapping"][nodeID] = (funcID, numInvocations)
-            else:
-                assert LOG_STEPS[STEP]["mapping"][nodeID] == (funcID,
-                                                              numInvocations)
-
-            if nodeID not in LOG_STEPS[STEP]["events"]:
-                LOG_STEPS[STEP]["events"][nodeID] = {
-                    event: (smID, blockID, cycleCount)
-                }
-            else:
-                assert event not in LOG_STEPS[STEP]["events"][nodeID]
-                LOG_STEPS[STEP]["events"][nodeID][event] = (smID, blockID,
-                                                            cycleCount)
-
-        elif event in [3, 4]:
-            if smID not in LOG_STEPS[STEP]["SMs"]:
-                assert event == 3
-                LOG_STEPS[STEP]["SMs"][smID] = {
-                    (numInvocations, nodeID, blockID): [cycleCount]
-                }
-            else:
-                if (numInvocations, nodeID,
-                        blockID) in LOG_STEPS[STEP]["SMs"][smID]:
-                    assert event == 4
-                    LOG_STEPS[STEP]["SMs"][smID][(numInvocations, nodeID,
-                                                  blockID)].append(cycleCount)
-                else:
-                    LOG_STEPS[STEP]["SMs"][smID][(numInvocations, nodeID,
-                                                  blockID)] = [cycleCount]
-
-        elif event == 5:
-            assert blockID not in LOG_STEPS[STEP]["final_cycles"]
-            LOG_STEPS[STEP]["final_cycles"][blockID] = cycleCount
-            LOG_STEPS[STEP]["final_timestamp"] = max(
-                LOG_STEPS[STEP]["final_timestamp"], cycleCount)
-        else:
-            assert (False & "event {} not supported".format(event))
+        exits = step[kind == EXIT]
+        final_cycles = np.empty(len(exits), dtype=FINAL_CYCLE_DTYPE)
+        final_cycles["blockID"] = exits["blockID"].to_numpy()
+        final_cycles["cycleCount"] = exits["cycleCount"].to_numpy()
 
-    # drop the last step which might be corrupted
-    # del LOG_STEPS[STEP]
-    print(
-        "At the end, complete traces for {} steps are generated".format(STEP))
-
-
-def serialized_analysis(step_log, nodes_map):
-
-    def calibrate(timestamp, reference):
-        return timestamp[2] - reference
-
-    for i in range(max(step_log["events"]) + 1):
-        # skipped nodes
-        if i not in step_log["events"]:
-            continue
-        nodes_map[i] = {
-            "nodeID":
-            i,
-            "funcID":
-            step_log["mapping"][i][0],
-            "invocations":
-            step_log["mapping"][i][1],
-            "start":
-            calibrate(step_log["events"][i][1], step_log["start_timestamp"]),
-            "end":
-            calibrate(step_log["events"][i][2], step_log["start_timestamp"]),
-            "SM utilization": []
+        LOG_STEPS[STEP] = {
+            "events": nodes,
+            "blocks": pair_block_events(step[kind == BLOCK]),
+            "mapping": mapping,
+            "final_cycles": final_cycles
         }
-        nodes_map[i][
-            "duration (ns)"] = nodes_map[i]["end"] - nodes_map[i]["start"]
-
-    total_exec_time = sum(v["duration (ns)"] for v in nodes_map.values())
-    for i in nodes_map:
-        nodes_map[i]["percentage (%)"] = nodes_map[i][
-            "duration (ns)"] / total_exec_time * 100
 
+    # drop the last step which might be corrupted
+    # del LOG_STEPS[STEP]
+    print("At the end, complete traces for {} steps are generated".format(
+        len(LOG_STEPS) - 1))
+
+
+def serialized_analysis(step_log, start_timestamp):
+    # one row per node, with the nodeStart (1) and nodeFinish (2) as columns
+    timestamps = step_log["events"].pivot(
+        index="nodeID", columns="event",
+        values="cycleCount") - start_timestamp
+
+    node_ids = timestamps.index.to_numpy()
+    nodes_map = pd.DataFrame(
+        {
+            "nodeID": node_ids,
+            "funcID": step_log["mapping"]["funcID"][node_ids],
+            "invocations": step_log["mapping"]["invocations"][node_ids],
+            "start": timestamps[1].to_numpy(),
+            "end": timestamps[2].to_numpy()
+        },
+        index=node_ids)
+    nodes_map["duration (ns)"] = nodes_map["end"] - nodes_map["start"]
+    nodes_map["percentage (%)"] = nodes_map["duration (ns)"] / nodes_map[
+        "duration (ns)"].sum() * 100
+    return nodes_map
+
+
+@njit(cache=True)
+def merge_intervals(starts, ends):
+    order = np.argsort(starts, kind="mergesort")
+    starts = starts[order]
+    ends = ends[order]
+
+    # sweep once, growing the last merged interval in place
+    n = 0
+    for i in range(1, len(starts)):
+        if starts[i] <= ends[n]:
+            ends[n] = max(ends[n], ends[i])
+        else:
+            n += 1
+            starts[n] = starts[i]
+            ends[n] = ends[i]
+    return starts[:n + 1], ends[:n + 1]
+
+
+def covered_time(starts, ends, node_starts, node_ends):
+    # starts/ends describe sorted, disjoint intervals
+    covered = np.concatenate(([0], np.cumsum(ends - starts)))
+    # intervals [first, last) overlap with each node
+    first = np.searchsorted(ends, node_starts, side="right")
+    last = np.maximum(np.searchsorted(starts, node_ends, side="left"), first)
+    occupied_time = covered[last] - covered[first]
+
+    # trim the intervals sticking out of the node on either side
+    overlap = first < last
+    occupied_time[overlap] -= np.maximum(
+        node_starts[overlap] - starts[first[overlap]], 0)
+    occupied_time[overlap] -= np.maximum(
+        ends[last[overlap] - 1] - node_ends[overlap], 0)
+    return occupied_time
+
+
+def group_by_sm(sm, group, starts, ends, other):
+    # {sm: {group: (start, end, other) rows}}, rows of a group are sorted
+    # and both SMs and groups are kept in order of first appearance
+    order = np.lexsort((other, ends, starts, group, sm))
+    sm, group = sm[order], group[order]
+    rows = np.stack([starts, ends, other], axis=1)[order]
+
+    heads = np.ones(len(order), dtype=bool)
+    heads[1:] = (sm[1:] != sm[:-1]) | (group[1:] != group[:-1])
+    heads = np.nonzero(heads)[0]
+    tails = np.append(heads[1:], len(order))
+    first_seen = np.minimum.reduceat(order, heads) if len(order) > 0 else []
+
+    sms, groups = sm[heads].tolist(), group[heads].tolist()
+    grouped = {}
+    for i in np.argsort(first_seen).tolist():
+        if sms[i] not in grouped:
+            grouped[sms[i]] = {}
+        grouped[sms[i]][groups[i]] = rows[heads[i]:tails[i]]
+    return grouped
+
+
+def block_analysis(step_log, nodes_map, start_timestamp, log):
+    execution = step_log["blocks"]
+    starts = execution["start"] - start_timestamp
+    ends = execution["end"] - start_timestamp
 
-def block_analysis(step_log, nodes_map):
-    sm_execution = {k: [] for k in step_log["SMs"].keys()}
     block_exec_time = {
-        "blocks": {k: {}
-                   for k in step_log["SMs"].keys()},  # horizontal
-        "nodes": {k: {}
-                  for k in step_log["SMs"].keys()},  # vertical
+        # horizontal, (start, end, nodeID) of every block
+        "blocks":
+        group_by_sm(execution["smID"], execution["blockID"], starts, ends,
+                    execution["nodeID"]),
+        # vertical, (start, end, blockID) of every node
+        "nodes":
+        group_by_sm(execution["smID"], execution["nodeID"], starts, ends,
+                    execution["blockID"]),
     }
+    for sm_blocks in block_exec_time["blocks"].values():
+        for events in sm_blocks.values():
+            assert (events[1:, 0] > events[:-1, 1]).all()
 
-    for sm in step_log["SMs"]:
-        for (_, nodeID, blockID), time_stamps in step_log["SMs"][sm].items():
-            start = time_stamps[0]
-            end = max(time_stamps[1:])
-            # confirm clock does proceed within an SM
-            assert end >= start
-            assert start > step_log["start_timestamp"]
-
-            start, end = [
-                i - step_log["start_timestamp"] for i in [start, end]
-            ]
-            sm_execution[sm].append((start, end))
-
-            if blockID not in block_exec_time["blocks"][sm]:
-                block_exec_time["blocks"][sm][blockID] = [(start, end, nodeID)]
-            else:
-                assert start > block_exec_time["blocks"][sm][blockID][-1][1]
-                block_exec_time["blocks"][sm][blockID].append(
-                    (start, end, nodeID))
-
-            if nodeID not in block_exec_time["nodes"][sm]:
-                block_exec_time["nodes"][sm][nodeID] = []
-            block_exec_time["nodes"][sm][nodeID].append((start, end, blockID))
-
-        block_exec_time["blocks"][sm] = {
-            k: sorted(v)
-            for k, v in block_exec_time["blocks"][sm].items()
-        }
-        block_exec_time["nodes"][sm] = {
-            k: sorted(v)
-            for k, v in block_exec_time["nodes"][sm].items()
-        }
+    node_starts = nodes_map["start"].to_numpy()
+    node_ends = nodes_map["end"].to_numpy()
+    durations = nodes_map["duration (ns)"].to_numpy()
+    sm_utilization = np.zeros(len(nodes_map))
+
+    for sm in block_exec_time["blocks"]:
+        on_sm = execution["smID"] == sm
+        sm_starts, sm_ends = merge_intervals(starts[on_sm], ends[on_sm])
+        sm_utilization += covered_time(sm_starts, sm_ends, node_starts,
+                                       node_ends) / durations
+
+    nodes_map["SM utilization"] = sm_utilization / len(
+        block_exec_time["blocks"])
 
-    for s in sm_execution:
-        intervals = []
-        for start, end in sm_execution[s]:
-            if len(intervals) == 0:
-                intervals.append((start, end))
-                continue
-            p = 0
-            while p < len(intervals):
-                if start > intervals[p][1]:
-                    p += 1
-                    continue
-                elif end < intervals[p][0]:
-                    intervals.insert(p, (start, end))
-                    break
-                else:
-                    intervals[p] = (min(start, intervals[p][0]),
-                                    max(end, intervals[p][1]))
-                    break
-            else:
-                intervals.insert(p, (start, end))
-
-        i_pointer = 0
-        for k, v in nodes_map.items():
-            occupied_time = 0
-            while i_pointer < len(intervals):
-                i_start, i_end = intervals[i_pointer]
-                if v["end"] < i_start:
-                    break
-                elif v["start"] <= i_start and v["end"] >= i_end:
-                    occupied_time += i_end - i_start
-                    i_pointer += 1
-                    continue
-                else:
-                    assert (False and "no intersections")
-            nodes_map[k]["SM utilization"].append(
-                occupied_time / nodes_map[k]["duration (ns)"])
-
-    for i in nodes_map:
-        assert (len(nodes_map[i]["SM utilization"]) == len(sm_execution))
-        nodes_map[i]["SM utilization"] = sum(
-            nodes_map[i]["SM utilization"]) / len(sm_execution)
-
-    print(
+    log.append(
         "For each SM on average, {:.3f}% of the time there is at least one block is running on"
-        .format(
-            sum(v["SM utilization"] * v["percentage (%)"]
-                for v in nodes_map.values())))
+        .format((nodes_map["SM utilization"] *
+                 nodes_map["percentage (%)"]).sum()))
 
     return block_exec_time
 
@@ -217,7 +259,25 @@ COLORS = [
 ]
 
 
-def plot_events(step_log, nodes_map, blocks, file_name):
+def paint_order(width, spans):
+    # index of the last span covering each pixel of a row, -1 if none;
+    # spans are inclusive [left, right] pixel ranges painted in order
+    lefts = np.clip(spans[:, 0], 0, width)
+    lengths = np.clip(spans[:, 1] + 1, 0, width) - lefts
+    lengths = np.maximum(lengths, 0)
+
+    index = np.repeat(np.arange(len(spans)), lengths)
+    pixels = lefts[index] + np.arange(len(index)) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths)
+    top = np.full(width, -1)
+    np.maximum.at(top, pixels, index)
+    return top
+
+
+def plot_events(nodes_map, blocks, final_timestamp, file_name, log):
+    # only needed for plotting, keep it out of parsing
+    from PIL import Image, ImageDraw, ImageColor
+
     num_sm = len(blocks)
     num_block_per_sm = 1
     num_pixel_per_block = 12
@@ -226,13 +286,11 @@ def plot_events(step_log, nodes_map, blocks, file_name):
     y_blank = num_pixel_per_block * 40
     y_limit = num_sm * num_pixel_per_sm + y_blank
     x_limit = y_limit * 2
-    print(x_limit, y_limit)
+    log.append("{} {}".format(x_limit, y_limit))
 
-    top_nodes = sorted([
-        i[0] for i in sorted(nodes_map.items(),
-                             key=lambda item: item[1]["duration (ns)"])
-        [len(nodes_map) - NUM_HIGHLIGHT_NODES:]
-    ])
+    top_nodes = sorted(
+        nodes_map.sort_values("duration (ns)", kind="stable").index[
+            len(nodes_map) - NUM_HIGHLIGHT_NODES:].tolist())
 
     colors = {}
     if HIDE_SEEK:
@@ -255,93 +313,147 @@ def plot_events(step_log, nodes_map, blocks, file_name):
             54: (148, 112, 206)
         }
     else:
-        for n in top_nodes:
-            func = nodes_map[n]["funcID"]
+        for func in nodes_map.loc[top_nodes, "funcID"].tolist():
             if func not in colors and len(colors) < len(COLORS):
                 colors[func] = COLORS[len(colors)]
-    print("Color mapping for functions:", colors)
-
-    img = Image.new("RGB", (x_limit, y_limit), "white")
-    draw = ImageDraw.Draw(img)
-
-    def cast_coor(timestamp, limit=x_limit):
-        assert (timestamp <= step_log["final_timestamp"])
-        return int(timestamp / step_log["final_timestamp"] * limit)
-
+    log.append("Color mapping for functions: {}".format(colors))
+
+    img = np.full((y_limit, x_limit, 3), 255, dtype=np.uint8)
+
+    def cast_coor(timestamps, limit=x_limit):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        assert (timestamps.max(initial=0) <= final_timestamp)
+        return (timestamps / final_timestamp * limit).astype(np.int64)
+
+    # rows covered by a bar, same as draw.line with width=num_pixel_per_block
+    bar_top = num_pixel_per_block // 2 - 1
+    bar_bottom = num_pixel_per_block - num_pixel_per_block // 2
+    # columns covered by the mark at the start of each bar
+    mark_width = num_pixel_per_block // 3
+    mark_left = mark_width // 2 - 1
+    mark_right = mark_width - mark_width // 2
+
+    # flatten the (start, end, nodeID) of all blocks, keeping the row and
+    # the range of events of every block
+    events = [np.empty((0, 3), dtype=np.int64)]
+    block_rows = []
+    first = 0
     for s, b in blocks.items():
         y = s * num_pixel_per_sm
-        for bb, events in b.items():
+        for bb, block_events in b.items():
             # draw.line((cast_coor(step_log["final_cycles"][bb]), y, x_limit, y),
             #           fill="grey",
             #           width=1)
-            for e in events:
-                bar_color = colors[nodes_map[e[2]]["funcID"]] if nodes_map[
-                    e[2]]["funcID"] in colors else "black"
-                bar_color = ImageColor.getrgb(bar_color) if isinstance(
-                    bar_color, str) else bar_color
-                draw.line((cast_coor(e[0]), y, cast_coor(e[1]), y),
-                          fill=bar_color,
-                          width=num_pixel_per_block)
-                # lighten the first pixel to indicate starting
-                draw.line((cast_coor(
-                    e[0]), y - num_pixel_per_block // 2 + 1, cast_coor(e[0]),
-                           y + num_pixel_per_block - num_pixel_per_block // 2),
-                          fill=tuple((i + 255) // 2 for i in bar_color),
-                          width=num_pixel_per_block // 3)
+            events.append(block_events)
+            block_rows.append((y, first, first + len(block_events)))
+            first += len(block_events)
             y += sm_interval_pixel
+    events = np.concatenate(events)
+
+    lefts = cast_coor(events[:, 0])
+    rights = cast_coor(events[:, 1])
+    # look up the funcID of every event, then its bar and mark colors
+    node_funcs = np.zeros(nodes_map.index.max() + 1, dtype=np.int64)
+    node_funcs[nodes_map.index] = nodes_map["funcID"]
+    num_funcs = max(node_funcs.max(), max(colors, default=0)) + 1
+    color_lut = np.zeros((num_funcs, 3), dtype=np.uint8)
+    for func, color in colors.items():
+        color_lut[func] = ImageColor.getrgb(color) if isinstance(
+            color, str) else color
+    light_lut = ((color_lut.astype(np.int16) + 255) // 2).astype(np.uint8)
+    funcs = node_funcs[events[:, 2]]
+
+    # each bar is followed by a lightened mark at its first pixel,
+    # zero-length bars are hidden under their mark
+    spans = np.empty((len(events), 2, 2), dtype=np.int64)
+    spans[:, 0, 0] = lefts
+    spans[:, 0, 1] = np.where(rights > lefts, rights, lefts - 1)
+    spans[:, 1, 0] = lefts - mark_left
+    spans[:, 1, 1] = lefts + mark_right
+    palette = np.stack([color_lut[funcs], light_lut[funcs]], axis=1)
+
+    for y, first, last in block_rows:
+        top = paint_order(x_limit, spans[first:last].reshape(-1, 2))
+        painted = top >= 0
+        img[max(y - bar_top, 0):y + bar_bottom + 1,
+            painted] = palette[first:last].reshape(-1, 3)[top[painted]]
+
+    img = Image.fromarray(img)
+    draw = ImageDraw.Draw(img)
 
     if not HIDE_SEEK:
         # mark the start and the end of major nodes_map
         y_shift = 0.9
-        for n in top_nodes:
-            # for n, v in nodes_map.items():
-            left, right = cast_coor(nodes_map[n]["start"]), cast_coor(
-                nodes_map[n]["end"])
+        lefts = cast_coor(nodes_map.loc[top_nodes, "start"]).tolist()
+        rights = cast_coor(nodes_map.loc[top_nodes, "end"]).tolist()
+        for n, left, right in zip(top_nodes, lefts, rights):
+            # for n, v in nodes_map.iterrows():
             draw.line((left, 0, left, y_limit), fill="red", width=1)
             draw.line((right, 0, right, y_limit), fill="green", width=1)
             draw.text((left, y_limit - y_blank * y_shift),
                       " f: {}\n t: {:.3f}ms\n {:.1f}%".format(
-                          nodes_map[n]["funcID"],
-                          (nodes_map[n]["duration (ns)"]) / 1000000,
-                          nodes_map[n]["percentage (%)"]),
+                          nodes_map.at[n, "funcID"],
+                          (nodes_map.at[n, "duration (ns)"]) / 1000000,
+                          nodes_map.at[n, "percentage (%)"]),
                       fill=(0, 0, 0))
             y_shift = 1.3 - y_shift
 
-    img.save(file_name)
+    # favor speed over size, zlib at the default level dominates saving
+    img.save(file_name, compress_level=1, optimize=False)
+
+
+TABULAR_COLUMNS = [
+    "nodeID", "funcID", "duration (ns)", "invocations", "percentage (%)",
+    "SM utilization", "start", "end"
+]
+
+
+def init_worker(num_highlight_nodes):
+    global NUM_HIGHLIGHT_NODES
+    NUM_HIGHLIGHT_NODES = num_highlight_nodes
 
 
-def step_analysis(step, file_name, tabular_data):
-    step_log = LOG_STEPS[step]
+def step_analysis(step, step_log, start_timestamp, final_timestamp,
+                  file_name):
     # manually add the nodeStart event for node 0
-    step_log["events"][0][1] = (0, 0, step_log["start_timestamp"])
+    step_log["events"] = pd.concat([
+        pd.DataFrame({
+            "event": [1],
+            "nodeID": [0],
+            "cycleCount": [start_timestamp]
+        }), step_log["events"]
+    ])
 
-    nodes_map = {}
-    serialized_analysis(step_log, nodes_map)
+    nodes_map = serialized_analysis(step_log, start_timestamp)
 
-    block_exec_time = block_analysis(step_log, nodes_map)
-    plot_events(step_log, nodes_map, block_exec_time["blocks"], file_name)
+    # collected instead of printed, workers would interleave the steps
+    log = []
+    block_exec_time = block_analysis(step_log, nodes_map, start_timestamp,
+                                     log)
+    plot_events(nodes_map, block_exec_time["blocks"], final_timestamp,
+                file_name, log)
 
-    for n in nodes_map:
-        tabular_data = pd.concat([
-            tabular_data,
-            pd.DataFrame({k: [v]
-                          for k, v in nodes_map[n].items()})
-        ])
-    return tabular_data
+    return nodes_map[TABULAR_COLUMNS], [
+        "step {}: {}".format(step, line) for line in log
+    ]
 
 
 if __name__ == "__main__":
+    # dump the metrics of all steps to one parquet file instead of xlsx
+    parquet = "--parquet" in sys.argv
+    if parquet:
+        sys.argv.remove("--parquet")
+
     if len(sys.argv) > 5:
         print(
-            "python parse_device_tracing.py [log_name] [# stps, default 1] [start from, default 10] [# highlight nodes, default 10]"
+            "python parse_device_tracing.py [log_name] [# stps, default 1] [start from, default 10] [# highlight nodes, default 10] [--parquet]"
         )
         exit()
 
-    with open(sys.argv[1], 'rb') as f:
-        events = bytearray(f.read())
-        assert len(events) % 32 == 0
-        print("{} events were logged in total".format(len(events) // 32))
-        parse_device_logs(events)
+    # map the log as records directly, the file is paged in on demand
+    records = np.memmap(sys.argv[1], dtype=EVENT_DTYPE, mode="r")
+    print("{} events were logged in total".format(len(records)))
+    parse_device_logs(records)
 
     # default value
     steps = 5
@@ -353,10 +465,9 @@ if __name__ == "__main__":
     if len(sys.argv) >= 5:
         NUM_HIGHLIGHT_NODES = int(sys.argv[4])
 
+    FINAL_TIMESTAMPS -= START_TIMESTAMPS
     for s in LOG_STEPS:
-        LOG_STEPS[s]["final_timestamp"] -= LOG_STEPS[s]["start_timestamp"]
-        for b in LOG_STEPS[s]["final_cycles"]:
-            LOG_STEPS[s]["final_cycles"][b] -= LOG_STEPS[s]["start_timestamp"]
+        LOG_STEPS[s]["final_cycles"]["cycleCount"] -= START_TIMESTAMPS[s]
 
     dir_path = sys.argv[1] + "_megakernel_events"
     isExist = os.path.exists(dir_path)
@@ -366,21 +477,31 @@ if __name__ == "__main__":
     assert start_from < len(LOG_STEPS)
     end_at = min(start_from + steps, len(LOG_STEPS))
 
-    tabular_data = [
-        pd.DataFrame({
-            "nodeID": [],
-            "funcID": [],
-            "duration (ns)": [],
-            "invocations": [],
-            "percentage (%)": [],
-            "SM utilization": []
-        }) for _ in range(start_from, end_at)
-    ]
-
-    with pd.ExcelWriter(dir_path + "/metrics.xlsx") as writer:
-        for s in range(start_from, end_at):
-            step_analysis(s, dir_path + "/step{}.png".format(s),
-                          tabular_data[s - start_from]).to_excel(
-                              writer,
-                              sheet_name="step{}".format(s),
-                              index=False)
+    # steps are independent, only ship the logs of the analyzed ones
+    with multiprocessing.Pool(processes=min(os.cpu_count() or 1,
+                                            end_at - start_from),
+                              initializer=init_worker,
+                              initargs=(NUM_HIGHLIGHT_NODES, )) as pool:
+        results = pool.starmap(
+            step_analysis,
+            [(s, LOG_STEPS[s], START_TIMESTAMPS[s], FINAL_TIMESTAMPS[s],
+              dir_path + "/step{}.png".format(s))
+             for s in range(start_from, end_at)])
+
+    tabular_data = []
+    for table, log in results:
+        print("\n".join(log))
+        tabular_data.append(table)
+
+    if parquet:
+        metrics = pd.concat([
+            table.assign(step=s)
+            for s, table in zip(range(start_from, end_at), tabular_data)
+        ])
+        metrics.to_parquet(dir_path + "/metrics.parquet", index=False)
+    else:
+        with pd.ExcelWriter(dir_path + "/metrics.xlsx") as writer:
+            for s, table in zip(range(start_from, end_at), tabular_data):
+                table.to_excel(writer,
+                               sheet_name="step{}".format(s),
+                               index=False)